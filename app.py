@@ -1,196 +1,312 @@
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-import os
-import folium
-import requests
-from streamlit_folium import st_folium
-from PIL import Image
-
-st.set_page_config(page_title="NYC Congestion Audit 2025", layout="wide")
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-RESULTS_DIR = BASE_DIR
-
-# --- CACHING FUNCTION (Prevents re-downloading map every time) ---
-@st.cache_data
-def get_nyc_geojson():
-    # Official NYC OpenData URL
-    url = "https://data.cityofnewyork.us/api/geospatial/d3c5-ddgc?method=export&format=GeoJSON"
-    try:
-        r = requests.get(url)
-        if r.status_code == 200:
-            return r.json()
-    except:
-        return None
-    return None
-
-def load_data(filename):
-    path = os.path.join(RESULTS_DIR, filename)
-    if os.path.exists(path):
-        return pd.read_csv(path)
-    return None
-
-# --- HEADER & KPI SECTION ---
-st.title("🚖 NYC Congestion Pricing Audit (2025)")
-st.markdown("### Executive Dashboard | Client: NYC Dept of Transportation")
-st.markdown("---")
-
-# Load Summary Data for KPIs
-df_rev = load_data("summary_revenue.csv")
-df_leak = load_data("audit_leakage_stats.csv")
-
-col1, col2, col3, col4 = st.columns(4)
-
-if df_rev is not None:
-    total_rev = df_rev['total_revenue'].sum()
-    total_surcharge = df_rev['total_surcharge'].sum()
-    total_rides = df_rev['total_rides'].sum()
-    
-    col1.metric("Total Revenue", f"${total_rev/1_000_000:.1f}M")
-    col2.metric("Surcharges", f"${total_surcharge/1_000_000:.1f}M")
-    col3.metric("Total Trips", f"{total_rides/1_000_000:.1f}M")
-
-if df_leak is not None:
-    compliance_rate = df_leak['compliance_rate_pct'].iloc[0]
-    col4.metric("Compliance Rate", f"{compliance_rate:.1f}%")
-
-st.markdown("---")
-
-# --- TABS ---
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
-    "🗺️ The Map (Border Effect)", 
-    "📉 The Flow (Velocity)", 
-    "💰 The Economics (Tips)", 
-    "☔ The Weather (Rain Tax)",
-    "🚨 Fraud Audit (Ghost Trips)"
-])
-
-# --- TAB 1: INTERACTIVE MAP (FIXED SOURCE) ---
-with tab1:
-    st.header("The Border Effect: Zone Avoidance")
-    st.write("Zones colored by % change in drop-offs. **Blue = Increase (Avoidance), Red = Decrease.**")
-    
-    col_map_a, col_map_b = st.columns([3, 1])
-    
-    with col_map_a:
-        df_border = load_data("border_effect.csv")
-        nyc_geo = get_nyc_geojson() # Use the cached downloader
-        
-        map_success = False
-        
-        if df_border is not None and nyc_geo is not None:
-            try:
-                # Ensure ZoneID is string for matching
-                df_border['ZoneID'] = df_border['ZoneID'].astype(str)
-                
-                m = folium.Map(location=[40.7644, -73.975], zoom_start=11)
-                
-                folium.Choropleth(
-                    geo_data=nyc_geo,
-                    name="choropleth",
-                    data=df_border,
-                    columns=["ZoneID", "pct_change"],
-                    # IMPORTANT: NYC OpenData uses 'location_id', not 'objectid'
-                    key_on="feature.properties.location_id", 
-                    fill_color="RdBu",
-                    fill_opacity=0.7,
-                    line_opacity=0.2,
-                    legend_name="% Change"
-                ).add_to(m)
-                
-                st_folium(m, width=900, height=500)
-                map_success = True
-            except Exception as e:
-                st.error(f"Map Error: {e}")
-        
-        # Fallback if map fails
-        if not map_success:
-            st.warning("⚠️ Interactive map unavailable. Displaying static chart.")
-            img_path = os.path.join(RESULTS_DIR, "viz_border_effect.png")
-            if os.path.exists(img_path):
-                st.image(Image.open(img_path), use_container_width=True)
-
-    with col_map_b:
-        st.subheader("Top Leaky Zones")
-        df_locs = load_data("audit_top3_leakage_locs.csv")
-        if df_locs is not None:
-            st.dataframe(df_locs, hide_index=True)
-
-# --- TAB 2: VELOCITY ---
-with tab2:
-    st.header("The Flow: Traffic Speed & Volume")
-    
-    df_q1 = load_data("impact_q1_comparison.csv")
-    if df_q1 is not None and len(df_q1) == 2:
-        vol_24 = df_q1[df_q1['period'] == '2024 Q1']['trip_count'].values[0]
-        vol_25 = df_q1[df_q1['period'] == '2025 Q1']['trip_count'].values[0]
-        pct_change = ((vol_25 - vol_24) / vol_24) * 100
-        st.info(f"📉 **Traffic Volume Impact:** Q1 Traffic changed by **{pct_change:.2f}%** compared to 2024.")
-
-    col1, col2 = st.columns(2)
-    with col1:
-        st.subheader("2024 (Baseline)")
-        img_24 = os.path.join(RESULTS_DIR, "viz_velocity_2024.png")
-        if os.path.exists(img_24):
-            st.image(Image.open(img_24), use_container_width=True)
-    with col2:
-        st.subheader("2025 (Post-Toll)")
-        img_25 = os.path.join(RESULTS_DIR, "viz_velocity_2025.png")
-        img_main = os.path.join(RESULTS_DIR, "viz_velocity_heatmap.png")
-        if os.path.exists(img_25):
-            st.image(Image.open(img_25), use_container_width=True)
-        elif os.path.exists(img_main):
-            st.image(Image.open(img_main), caption="2025 Heatmap", use_container_width=True)
-
-# --- TAB 3: ECONOMICS ---
-with tab3:
-    st.header("The Economics: Driver Tips vs. Surcharges")
-    
-    col_c, col_d = st.columns([3, 1])
-    with col_c:
-        img_path = os.path.join(RESULTS_DIR, "viz_crowding_out.png")
-        if os.path.exists(img_path):
-            st.image(Image.open(img_path), caption="Crowding Out Effect (Blue=Fee, Red=Tip)", use_container_width=True)
-            
-    with col_d:
-        st.subheader("Fairness Analysis")
-        df_fair = load_data("summary_fairness.csv")
-        if df_fair is not None:
-            avg_tip = df_fair['avg_tip_percent'].mean()
-            st.metric("Avg Tip % (2025)", f"{avg_tip:.1f}%")
-
-# --- TAB 4: WEATHER ---
-with tab4:
-    st.header("The Weather: Rain Elasticity")
-    csv_path = os.path.join(RESULTS_DIR, "weather_elasticity.csv")
-    
-    if os.path.exists(csv_path):
-        df = pd.read_csv(csv_path)
-        col_e, col_f = st.columns([3, 1])
-        with col_e:
-            try:
-                fig = px.scatter(df, x="prcp_mm", y="trip_count", trendline="ols", 
-                                title="Daily Trip Volume vs. Rainfall (2025)")
-            except:
-                fig = px.scatter(df, x="prcp_mm", y="trip_count", 
-                                title="Daily Trip Volume vs. Rainfall (2025)")
-            st.plotly_chart(fig, use_container_width=True)
-        with col_f:
-            corr = df['trip_count'].corr(df['prcp_mm'])
-            st.metric("Elasticity Score", f"{corr:.3f}")
-            st.write("Verdict: **INELASTIC**" if abs(corr) < 0.3 else "Verdict: **ELASTIC**")
-
-# --- TAB 5: FRAUD AUDIT ---
-with tab5:
-    st.header("🚨 System Integrity: Ghost Trip Audit")
-    df_fraud = load_data("summary_fraud.csv")
-    if df_fraud is not None:
-        fig_fraud = px.bar(df_fraud, x="violation_count", y="violation_type", 
-                           orientation='h', color="violation_type", title="Suspicious Trips Detected")
-        st.plotly_chart(fig_fraud, use_container_width=True)
-        
-        st.subheader("Top Suspicious Vendors")
-        df_vendors = load_data("audit_suspicious_vendors.csv")
-        if df_vendors is not None:
-
-            st.dataframe(df_vendors, hide_index=True)
+import streamlit as st
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import gzip
+import json
+import os
+import pydeck as pdk
+import requests
+
+st.set_page_config(page_title="NYC Congestion Audit 2025", layout="wide")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# The pipeline publishes into results/; the repo root keeps the committed
+# baseline artifacts, so it stays as a fallback for files not yet
+# regenerated locally.
+RESULTS_DIR = os.path.join(BASE_DIR, "results")
+RESULT_DIRS = (RESULTS_DIR, BASE_DIR)
+GEOJSON_CACHE = os.path.join(BASE_DIR, "nyc_zones.geojson.gz")
+
+def find_result(filename):
+    for d in RESULT_DIRS:
+        path = os.path.join(d, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+# --- CACHING FUNCTION (Prevents re-downloading map every time) ---
+# cache_resource (not cache_data) so Streamlit hands back the parsed dict by
+# reference instead of hashing the ~10MB structure on every rerun.
+@st.cache_resource
+def get_nyc_geojson():
+    # Cold starts after the first download read the gzipped copy from disk
+    # and skip the network round-trip entirely.
+    if os.path.exists(GEOJSON_CACHE):
+        try:
+            with gzip.open(GEOJSON_CACHE, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            pass  # corrupt cache -> fall through to re-download
+
+    # Official NYC OpenData URL
+    url = "https://data.cityofnewyork.us/api/geospatial/d3c5-ddgc?method=export&format=GeoJSON"
+    try:
+        # gzip only: requests can't decode brotli without an extra package.
+        r = requests.get(url, headers={'Accept-Encoding': 'gzip'})
+        if r.status_code == 200:
+            geo = r.json()
+            with gzip.open(GEOJSON_CACHE, 'wt', encoding='utf-8') as f:
+                json.dump(geo, f)
+            return geo
+    except:
+        return None
+    return None
+
+# cache_resource returns the same DataFrame object by reference on every
+# rerun — no output hashing, no disk read. The frames are read-only here,
+# so sharing one object across reruns is safe.
+@st.cache_resource
+def load_data(filename):
+    # Phase 2 now ships Parquet; prefer it (typed + compressed, much faster
+    # to load) and keep the CSV path for older result sets.
+    base, _ = os.path.splitext(filename)
+    parquet_path = find_result(base + ".parquet")
+    if parquet_path:
+        return pd.read_parquet(parquet_path)
+    path = find_result(filename)
+    if path:
+        return pd.read_csv(path)
+    return None
+
+def find_image(basename):
+    # Phase 3 writes .webp now; older result sets only have the .png
+    # renders, so fall back the same way load_data does for parquet->CSV.
+    for ext in ('.webp', '.png'):
+        path = find_result(basename + ext)
+        if path:
+            return path
+    return None
+
+@st.cache_resource
+def load_border_data():
+    # ZoneID is written as a string by Phase 3 (it must match the GeoJSON
+    # location_id keys); pin the dtype so no per-rerun conversion is needed.
+    path = find_result("border_effect.csv")
+    if path:
+        return pd.read_csv(path, dtype={'ZoneID': 'string'})
+    return None
+
+@st.cache_resource
+def build_weather_fig(csv_path):
+    """Build the rain-elasticity scatter once. The trendline is a simple
+    least-squares fit via np.polyfit — same line as statsmodels OLS at a
+    fraction of the cost, and without re-fitting on every rerun."""
+    df = pd.read_csv(csv_path)
+    corr = np.corrcoef(df['trip_count'].to_numpy(), df['prcp_mm'].to_numpy())[0, 1]
+    fig = px.scatter(df, x="prcp_mm", y="trip_count",
+                     title="Daily Trip Volume vs. Rainfall (2025)")
+    if len(df) > 1:
+        slope, intercept = np.polyfit(df['prcp_mm'], df['trip_count'], 1)
+        xs = np.array([df['prcp_mm'].min(), df['prcp_mm'].max()])
+        fig.add_scatter(x=xs, y=slope * xs + intercept, mode='lines', name='OLS')
+    return fig, corr
+
+@st.cache_resource
+def build_zone_geojson():
+    """Join pct_change into the zone GeoJSON once, with a pre-assigned
+    diverging fill color per feature, so the GPU layer needs no per-render
+    work. Blue = increase (avoidance), red = decrease."""
+    nyc_geo = get_nyc_geojson()
+    df_border = load_border_data()
+    if nyc_geo is None or df_border is None:
+        return None
+
+    changes = dict(zip(df_border['ZoneID'], df_border['pct_change']))
+    if not changes:  # border_effect.csv exists but has no data rows
+        return None
+    max_abs = max(abs(v) for v in changes.values()) or 1.0
+
+    features = []
+    for feat in nyc_geo.get('features', []):
+        zone_id = str(feat.get('properties', {}).get('location_id'))
+        if zone_id not in changes:
+            continue
+        pct = changes[zone_id]
+        intensity = int(min(abs(pct) / max_abs, 1.0) * 180) + 40
+        if pct >= 0:
+            fill = [60, 110, intensity + 35, 180]   # blue-ish
+        else:
+            fill = [intensity + 35, 70, 60, 180]    # red-ish
+        feat['properties']['pct_change'] = round(float(pct), 2)
+        feat['properties']['fill_color'] = fill
+        features.append(feat)
+
+    if not features:
+        return None
+    return {'type': 'FeatureCollection', 'features': features}
+
+# --- HEADER & KPI SECTION ---
+st.title("🚖 NYC Congestion Pricing Audit (2025)")
+st.markdown("### Executive Dashboard | Client: NYC Dept of Transportation")
+st.markdown("---")
+
+# Load Summary Data for KPIs
+df_rev = load_data("summary_revenue.csv")
+df_leak = load_data("audit_leakage_stats.csv")
+
+col1, col2, col3, col4 = st.columns(4)
+
+if df_rev is not None:
+    total_rev = df_rev['total_revenue'].sum()
+    total_surcharge = df_rev['total_surcharge'].sum()
+    total_rides = df_rev['total_rides'].sum()
+    
+    col1.metric("Total Revenue", f"${total_rev/1_000_000:.1f}M")
+    col2.metric("Surcharges", f"${total_surcharge/1_000_000:.1f}M")
+    col3.metric("Total Trips", f"{total_rides/1_000_000:.1f}M")
+
+if df_leak is not None:
+    compliance_rate = df_leak['compliance_rate_pct'].iloc[0]
+    col4.metric("Compliance Rate", f"{compliance_rate:.1f}%")
+
+st.markdown("---")
+
+# --- VIEWS ---
+# st.tabs evaluates every branch on every rerun, so all five data loads ran
+# even when one view was visible. A radio selector + st.fragment render
+# functions mean only the active view executes, and interactions inside a
+# fragment rerun that fragment alone.
+VIEWS = [
+    "\U0001f5fa\ufe0f The Map (Border Effect)",
+    "\U0001f4c9 The Flow (Velocity)",
+    "\U0001f4b0 The Economics (Tips)",
+    "\u2614 The Weather (Rain Tax)",
+    "\U0001f6a8 Fraud Audit (Ghost Trips)",
+]
+
+# --- VIEW 1: INTERACTIVE MAP (FIXED SOURCE) ---
+@st.fragment
+def render_map():
+    st.header("The Border Effect: Zone Avoidance")
+    st.write("Zones colored by % change in drop-offs. **Blue = Increase (Avoidance), Red = Decrease.**")
+
+    col_map_a, col_map_b = st.columns([3, 1])
+
+    with col_map_a:
+        zone_geo = build_zone_geojson() # Cached: GeoJSON + colors built once
+
+        map_success = False
+
+        if zone_geo is not None:
+            try:
+                # WebGL vector layer: the browser draws the polygons on the
+                # GPU instead of folium's per-feature SVG rendering.
+                layer = pdk.Layer(
+                    'GeoJsonLayer',
+                    data=zone_geo,
+                    get_fill_color='properties.fill_color',
+                    get_line_color=[80, 80, 80],
+                    line_width_min_pixels=1,
+                    stroked=True,
+                    pickable=True,
+                )
+                view = pdk.ViewState(latitude=40.7644, longitude=-73.975, zoom=11)
+                st.pydeck_chart(pdk.Deck(
+                    layers=[layer],
+                    initial_view_state=view,
+                    tooltip={"text": "Zone {location_id}: {pct_change}%"},
+                ))
+                map_success = True
+            except Exception as e:
+                st.error(f"Map Error: {e}")
+
+        # Fallback if map fails
+        if not map_success:
+            st.warning("\u26a0\ufe0f Interactive map unavailable. Displaying static chart.")
+            img_path = find_image("viz_border_effect")
+            if img_path:
+                st.image(img_path, use_container_width=True)
+
+    with col_map_b:
+        st.subheader("Top Leaky Zones")
+        df_locs = load_data("audit_top3_leakage_locs.csv")
+        if df_locs is not None:
+            st.dataframe(df_locs, hide_index=True)
+
+# --- VIEW 2: VELOCITY ---
+@st.fragment
+def render_velocity():
+    st.header("The Flow: Traffic Speed & Volume")
+
+    df_q1 = load_data("impact_q1_comparison.csv")
+    if df_q1 is not None and len(df_q1) == 2:
+        vol_24 = df_q1[df_q1['period'] == '2024 Q1']['trip_count'].values[0]
+        vol_25 = df_q1[df_q1['period'] == '2025 Q1']['trip_count'].values[0]
+        pct_change = ((vol_25 - vol_24) / vol_24) * 100
+        st.info(f"\U0001f4c9 **Traffic Volume Impact:** Q1 Traffic changed by **{pct_change:.2f}%** compared to 2024.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("2024 (Baseline)")
+        img_24 = find_image("viz_velocity_2024")
+        if img_24:
+            st.image(img_24, use_container_width=True)
+    with col2:
+        st.subheader("2025 (Post-Toll)")
+        img_25 = find_image("viz_velocity_2025")
+        img_main = find_image("viz_velocity_heatmap")
+        if img_25:
+            st.image(img_25, use_container_width=True)
+        elif img_main:
+            st.image(img_main, caption="2025 Heatmap", use_container_width=True)
+
+# --- VIEW 3: ECONOMICS ---
+@st.fragment
+def render_economics():
+    st.header("The Economics: Driver Tips vs. Surcharges")
+
+    col_c, col_d = st.columns([3, 1])
+    with col_c:
+        img_path = find_image("viz_crowding_out")
+        if img_path:
+            st.image(img_path, caption="Crowding Out Effect (Blue=Fee, Red=Tip)", use_container_width=True)
+
+    with col_d:
+        st.subheader("Fairness Analysis")
+        df_fair = load_data("summary_fairness.csv")
+        if df_fair is not None:
+            avg_tip = df_fair['avg_tip_percent'].mean()
+            st.metric("Avg Tip % (2025)", f"{avg_tip:.1f}%")
+
+# --- VIEW 4: WEATHER ---
+@st.fragment
+def render_weather():
+    st.header("The Weather: Rain Elasticity")
+    csv_path = find_result("weather_elasticity.csv")
+
+    if csv_path:
+        fig, corr = build_weather_fig(csv_path)
+        col_e, col_f = st.columns([3, 1])
+        with col_e:
+            st.plotly_chart(fig, use_container_width=True)
+        with col_f:
+            st.metric("Elasticity Score", f"{corr:.3f}")
+            st.write("Verdict: **INELASTIC**" if abs(corr) < 0.3 else "Verdict: **ELASTIC**")
+
+# --- VIEW 5: FRAUD AUDIT ---
+@st.fragment
+def render_fraud():
+    st.header("\U0001f6a8 System Integrity: Ghost Trip Audit")
+    df_fraud = load_data("summary_fraud.csv")
+    if df_fraud is not None:
+        fig_fraud = px.bar(df_fraud, x="violation_count", y="violation_type",
+                           orientation='h', color="violation_type", title="Suspicious Trips Detected")
+        st.plotly_chart(fig_fraud, use_container_width=True)
+
+        st.subheader("Top Suspicious Vendors")
+        df_vendors = load_data("audit_suspicious_vendors.csv")
+        if df_vendors is not None:
+            st.dataframe(df_vendors, hide_index=True)
+
+active_view = st.radio("View", VIEWS, horizontal=True, label_visibility="collapsed")
+
+if active_view == VIEWS[0]:
+    render_map()
+elif active_view == VIEWS[1]:
+    render_velocity()
+elif active_view == VIEWS[2]:
+    render_economics()
+elif active_view == VIEWS[3]:
+    render_weather()
+else:
+    render_fraud()
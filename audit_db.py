@@ -0,0 +1,114 @@
+import duckdb
+import glob
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, "audit.duckdb")
+CLEAN_2025_GLOB = os.path.join(BASE_DIR, "processed_data", "is_bad=false", "*", "*.parquet")
+
+# Congestion pricing went live on this date; trips before it are exempt.
+CONGESTION_START_DATE = "2025-01-05"
+
+# "Manhattan South of 60th St" (Source: NYC TLC Zone Map)
+CONGESTION_ZONE_IDS = (
+    12, 13, 43, 45, 48, 50, 68, 79, 87, 88, 90, 100, 107, 113, 114, 116, 120, 125,
+    137, 140, 141, 142, 143, 144, 148, 151, 152, 153, 158, 161, 162, 163, 164, 166,
+    170, 186, 209, 211, 224, 229, 230, 231, 232, 233, 234, 236, 237, 238, 239, 243,
+    244, 246, 249, 261, 262, 263
+)
+
+# Zones straddling the 60th St toll boundary, watched for drop-off shifts.
+BORDER_ZONES = (
+    238, 239, 263, 262, 236, 237, 74, 75, 142, 143, 43, 48, 50, 100,
+    161, 162, 163, 164, 230
+)
+
+# One connection shared by every phase. Keeping it on disk (audit.duckdb)
+# lets DuckDB cache parquet metadata across queries instead of re-reading
+# footers each time a phase opens its own ':memory:' database.
+_connection = None
+
+def get_connection():
+    global _connection
+    if _connection is None:
+        _connection = duckdb.connect(DB_PATH)
+        _connection.execute("PRAGMA enable_object_cache=true")
+        configure(_connection)
+        # Queries probe these tables as hash semi-joins instead of chewing
+        # through long literal IN lists per row. Regular (not temp) tables
+        # so cursors spawned for worker threads can see them too.
+        _connection.execute(
+            "CREATE OR REPLACE TABLE congestion_zones AS SELECT unnest(?::SMALLINT[]) AS zone_id",
+            [list(CONGESTION_ZONE_IDS)],
+        )
+        _connection.execute(
+            "CREATE OR REPLACE TABLE border_zones AS SELECT unnest(?::SMALLINT[]) AS zone_id",
+            [list(BORDER_ZONES)],
+        )
+        register_views(_connection)
+    return _connection
+
+def configure(con):
+    """Tune a connection for this workload: parallel parquet scans and
+    unordered COPY writes (preserve_insertion_order=false lets writers run
+    fully parallel; none of our outputs depend on row order).
+
+    Threads are capped at the physical-core estimate (half the logical
+    count): the scan-heavy queries here degrade under hyperthread
+    oversubscription, and the explicit memory cap keeps aggregations from
+    ballooning their hash tables just because RAM looks plentiful."""
+    con.execute(f"PRAGMA threads={max((os.cpu_count() or 2) // 2, 1)}")
+    con.execute("PRAGMA memory_limit='8GB'")
+    con.execute("PRAGMA preserve_insertion_order=false")
+    con.execute("PRAGMA enable_progress_bar=false")
+
+def has_clean_table(con):
+    """True if Phase 1 has materialized the native clean25 table."""
+    return bool(con.execute(
+        "SELECT 1 FROM duckdb_tables() WHERE table_name = 'clean25'"
+    ).fetchall())
+
+def materialize_clean_table(con):
+    """Load the clean 2025 parquet into DuckDB's native storage.
+
+    Repeated pipeline runs (and every phase after Phase 1) then scan the
+    native clean25 table instead of re-decompressing the parquet files on
+    each query.
+    """
+    clean_glob = CLEAN_2025_GLOB.replace(os.sep, '/')
+    # A standalone Phase 3 run on a fresh database leaves its parquet
+    # fallback VIEW under this name; CREATE OR REPLACE TABLE refuses to
+    # replace an object of a different type, so clear the view first.
+    # Probe duckdb_views() before dropping — an unconditional DROP VIEW
+    # trips over the table a previous run materialized under this name.
+    if con.execute(
+        "SELECT 1 FROM duckdb_views() WHERE view_name = 'clean25'"
+    ).fetchall():
+        con.execute("DROP VIEW clean25")
+    con.execute(f"""
+        CREATE OR REPLACE TABLE clean25 AS
+        SELECT pickup_time, dropoff_time, pickup_loc, dropoff_loc, trip_distance,
+               fare, total_amount, congestion_surcharge, taxi_type, speed_mph
+        FROM read_parquet('{clean_glob}')
+    """)
+
+def register_views(con):
+    """(Re)point the trips_2025 view at the Phase 1 clean output.
+
+    Called again by Phase 1 after it writes the partitioned parquet, since
+    the view cannot bind before the files exist. Prefers the native clean25
+    table when Phase 1 has materialized it; the parquet glob is the
+    fallback for databases that predate the native table.
+    """
+    if has_clean_table(con):
+        con.execute("CREATE OR REPLACE VIEW trips_2025 AS SELECT * FROM clean25")
+    elif glob.glob(CLEAN_2025_GLOB):
+        clean_glob = CLEAN_2025_GLOB.replace(os.sep, '/')
+        # Explicit column list so the parquet reader only ever decodes the
+        # chunks a query actually touches (no accidental SELECT * reads).
+        con.execute(f"""
+            CREATE OR REPLACE VIEW trips_2025 AS
+            SELECT pickup_time, dropoff_time, pickup_loc, dropoff_loc, trip_distance,
+                   fare, total_amount, congestion_surcharge, taxi_type, speed_mph
+            FROM read_parquet('{clean_glob}')
+        """)
@@ -1,166 +1,317 @@
-import duckdb
-import os
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-RAW_DIR = os.path.join(BASE_DIR, "raw_data")
-CLEAN_2025_DIR = os.path.join(BASE_DIR, "processed_data", "clean_data", "*.parquet")
-RESULTS_DIR = os.path.join(BASE_DIR, "results")
-
-# Geospatial Definitions
-CONGESTION_ZONE_IDS = (12, 13, 43, 45, 48, 50, 68, 79, 87, 88, 90, 100, 107, 113, 114, 116, 120, 125, 137, 140, 141, 142, 143, 144, 148, 151, 152, 153, 158, 161, 162, 163, 164, 166, 170, 186, 209, 211, 224, 229, 230, 231, 232, 233, 234, 236, 237, 238, 239, 243, 244, 246, 249, 261, 262, 263)
-BORDER_ZONES = (238, 239, 263, 262, 236, 237, 74, 75, 142, 143, 43, 48, 50, 100, 161, 162, 163, 164, 230)
-
-class VisualAudit:
-    def __init__(self):
-        print("Initializing Phase 3: Visual Audit Engine...")
-        self.con = duckdb.connect(database=':memory:')
-        sns.set_theme(style="whitegrid")
-        self.raw_path = RAW_DIR.replace('\\', '/')
-        self.clean_path = CLEAN_2025_DIR.replace('\\', '/')
-
-    def plot_border_effect(self):
-        print("  > Generating 'Border Effect' Data & Image...")
-        
-        q_24 = f"""
-            SELECT DOLocationID as ZoneID, COUNT(*) as count_2024
-            FROM read_parquet([
-                '{self.raw_path}/yellow_tripdata_2024-01.parquet', '{self.raw_path}/yellow_tripdata_2024-02.parquet', '{self.raw_path}/yellow_tripdata_2024-03.parquet',
-                '{self.raw_path}/green_tripdata_2024-01.parquet', '{self.raw_path}/green_tripdata_2024-02.parquet', '{self.raw_path}/green_tripdata_2024-03.parquet'
-            ], union_by_name=True)
-            WHERE DOLocationID IN {BORDER_ZONES} GROUP BY 1
-        """
-        q_25 = f"""
-            SELECT dropoff_loc as ZoneID, COUNT(*) as count_2025
-            FROM read_parquet('{self.clean_path}')
-            WHERE dropoff_loc IN {BORDER_ZONES} AND MONTH(pickup_time) IN (1, 2, 3) GROUP BY 1
-        """
-        
-        final_query = f"""
-            WITH t24 AS ({q_24}), t25 AS ({q_25})
-            SELECT 
-                t24.ZoneID, 
-                ((count_2025 - count_2024) / count_2024::FLOAT) * 100 as pct_change,
-                CASE WHEN t24.ZoneID IN {CONGESTION_ZONE_IDS} THEN 'Inside Zone' ELSE 'Outside Zone' END as location_type
-            FROM t24 JOIN t25 ON t24.ZoneID = t25.ZoneID
-            ORDER BY pct_change DESC
-        """
-        df = self.con.execute(final_query).df()
-        
-        # SAVE CSV FOR MAP
-        df.to_csv(os.path.join(RESULTS_DIR, "border_effect.csv"), index=False)
-
-        # Plot Image
-        plt.figure(figsize=(12, 6))
-        palette = {"Inside Zone": "#e74c3c", "Outside Zone": "#3498db"}
-        sns.barplot(data=df, x="ZoneID", y="pct_change", hue="location_type", palette=palette, dodge=False)
-        plt.axhline(0, color='black', linewidth=1)
-        plt.title("Border Effect: % Change in Drop-offs (Q1 2024 vs Q1 2025)", fontsize=14)
-        plt.tight_layout()
-        plt.savefig(os.path.join(RESULTS_DIR, "viz_border_effect.png"))
-        print("    - Saved: viz_border_effect.png + border_effect.csv")
-
-    def _save_heatmap_img(self, df, filename, title):
-        pivot = df.pivot(index="day_num", columns="hour_num", values="avg_speed")
-        pivot.index = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-        plt.figure(figsize=(10, 6)) 
-        sns.heatmap(pivot, cmap="magma", annot=False, fmt=".1f", vmin=5, vmax=20)
-        plt.title(title, fontsize=12)
-        plt.tight_layout()
-        plt.savefig(os.path.join(RESULTS_DIR, filename))
-        print(f"    - Saved: {filename}")
-
-    def plot_velocity_heatmaps(self):
-        print("  > Generating 'Before vs After' Velocity Heatmaps...")
-        
-        # 1. BEFORE (2024)
-        q_24 = f"""
-            SELECT isodow(tpep_pickup_datetime) as day_num, extract(hour from tpep_pickup_datetime) as hour_num,
-            AVG(trip_distance / (date_part('epoch', tpep_dropoff_datetime) - date_part('epoch', tpep_pickup_datetime)) * 3600) as avg_speed
-            FROM read_parquet(['{self.raw_path}/yellow_tripdata_2024-01.parquet', '{self.raw_path}/yellow_tripdata_2024-02.parquet', '{self.raw_path}/yellow_tripdata_2024-03.parquet'])
-            WHERE PULocationID IN {CONGESTION_ZONE_IDS} AND DOLocationID IN {CONGESTION_ZONE_IDS}
-            AND trip_distance > 0.5 
-            AND (date_part('epoch', tpep_dropoff_datetime) - date_part('epoch', tpep_pickup_datetime)) > 60
-            GROUP BY 1, 2
-        """
-        df_24 = self.con.execute(q_24).df()
-        self._save_heatmap_img(df_24, "viz_velocity_2024.png", "Congestion Velocity: Q1 2024 (Baseline)")
-
-        # 2. AFTER (2025)
-        q_25 = f"""
-            SELECT isodow(pickup_time) as day_num, extract(hour from pickup_time) as hour_num,
-            AVG(trip_distance / (date_part('epoch', dropoff_time) - date_part('epoch', pickup_time)) * 3600) as avg_speed
-            FROM read_parquet('{self.clean_path}')
-            WHERE pickup_loc IN {CONGESTION_ZONE_IDS} AND dropoff_loc IN {CONGESTION_ZONE_IDS}
-            AND MONTH(pickup_time) IN (1, 2, 3) AND trip_distance > 0.5
-            AND (date_part('epoch', dropoff_time) - date_part('epoch', pickup_time)) > 60
-            GROUP BY 1, 2
-        """
-        df_25 = self.con.execute(q_25).df()
-        self._save_heatmap_img(df_25, "viz_velocity_2025.png", "Congestion Velocity: Q1 2025 (Post-Toll)")
-        
-        # Save MAIN heatmap for dashboard default
-        self._save_heatmap_img(df_25, "viz_velocity_heatmap.png", "Congestion Velocity: Q1 2025 (Post-Toll)")
-
-    def plot_crowding_out(self):
-        print("  > Generating 'Crowding Out' Analysis (FORCE VISIBILITY MODE)...")
-        query = f"""
-            SELECT strftime(date_trunc('month', pickup_time), '%Y-%m') as month_str,
-            AVG(COALESCE(congestion_surcharge, 0)) as avg_surcharge,
-            AVG(CASE WHEN fare > 0 THEN (COALESCE(total_amount, 0) - COALESCE(fare, 0) - COALESCE(congestion_surcharge, 0)) / COALESCE(fare, 1) ELSE 0 END) * 100 as avg_tip_pct
-            FROM read_parquet('{self.clean_path}')
-            WHERE fare > 0 AND pickup_time >= '2024-01-01' AND pickup_time < '2026-01-01'
-            GROUP BY 1 ORDER BY 1
-        """
-        df = self.con.execute(query).df()
-        
-        # DEBUG PRINT: Verify data exists
-        print("    [DEBUG] Tip Data Preview:")
-        print(df[['month_str', 'avg_tip_pct']].head())
-
-        fig, ax1 = plt.subplots(figsize=(12, 6))
-        
-        # 1. Plot Blue Bars (Surcharge) - Semi-transparent so they don't hide anything
-        color = 'tab:blue'
-        ax1.set_xlabel('Month')
-        ax1.set_ylabel('Avg Surcharge ($)', color=color, fontweight='bold')
-        ax1.bar(df['month_str'], df['avg_surcharge'], color=color, alpha=0.4, label='Surcharge')
-        ax1.tick_params(axis='y', labelcolor=color)
-        plt.setp(ax1.xaxis.get_majorticklabels(), rotation=45, ha='right')
-        
-        # 2. Plot Red Line (Tips) - Secondary Axis
-        ax2 = ax1.twinx()
-        color = 'tab:red'
-        ax2.set_ylabel('Avg Tip %', color=color, fontweight='bold')
-        
-        # FORCE SCALE: Ensure the line doesn't disappear if values are small
-        # We set the limit from 0 to 120% of the max value to keep it centered
-        max_tip = df['avg_tip_pct'].max()
-        if max_tip > 0:
-            ax2.set_ylim(0, max_tip * 1.2)
-        
-        # FORCE Z-ORDER: Draw line ON TOP of everything (zorder=10)
-        ax2.plot(df['month_str'], df['avg_tip_pct'], color=color, marker='o', 
-                 linewidth=4, markersize=8, label='Tip %', zorder=10)
-        ax2.tick_params(axis='y', labelcolor=color)
-        
-        # TRICK: Ensure ax2 background is transparent so ax1 bars show through
-        ax2.patch.set_visible(False)
-        ax1.set_zorder(1)
-        ax2.set_zorder(10)
-        
-        plt.title("Crowding Out Effect: Surcharge vs Tip %", fontsize=14)
-        plt.tight_layout()
-        plt.savefig(os.path.join(RESULTS_DIR, "viz_crowding_out.png"))
-        print("    - Saved: viz_crowding_out.png")
-
-    def run(self):
-        self.plot_border_effect()
-        self.plot_velocity_heatmaps()
-        self.plot_crowding_out()
-
-if __name__ == "__main__":
-    audit = VisualAudit()
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # headless: skip GUI backend probing
+import matplotlib.pyplot as plt
+from matplotlib.patches import Patch
+import seaborn as sns
+
+import audit_db
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_DIR = os.path.join(BASE_DIR, "raw_data")
+CLEAN_2025_DIR = os.path.join(BASE_DIR, "processed_data", "is_bad=false", "*", "*.parquet")
+RESULTS_DIR = os.path.join(BASE_DIR, "results")
+
+# Geospatial definitions live in audit_db, which loads them into the
+# congestion_zones / border_zones tables queries probe as hash semi-joins.
+
+class VisualAudit:
+    def __init__(self, con=None):
+        print("Initializing Phase 3: Visual Audit Engine...")
+        # Shared connection: parquet metadata cached by earlier phases is
+        # still warm when the plots run.
+        self.con = con if con is not None else audit_db.get_connection()
+        sns.set_theme(style="whitegrid")
+        # Constrained layout solves placement during draw, replacing the
+        # extra full render pass tight_layout() ran on every save.
+        plt.rcParams['figure.constrained_layout.use'] = True
+        # One Figure reused by every plot (clf + resize between saves):
+        # figure construction/teardown is the dominant matplotlib cost for
+        # sub-second charts.
+        self._fig = plt.figure(figsize=(12, 6))
+        self.raw_path = RAW_DIR.replace('\\', '/')
+        self._register_clean_2025()
+        self._load_baseline_2024()
+        self._build_agg_2025()
+
+    def _register_clean_2025(self):
+        """One clean25 relation for all three plots. If Phase 1 materialized
+        the native clean25 table on this database, use it as-is (no parquet
+        decode at all); otherwise fall back to a view over an explicit file
+        list so the glob is expanded and its metadata read only once."""
+        if audit_db.has_clean_table(self.con):
+            return
+        clean_files = sorted(glob.glob(CLEAN_2025_DIR))
+        # CREATE VIEW can't be a prepared statement, so the expanded list is
+        # spliced in as SQL literals (paths come from our own glob).
+        files_sql = ", ".join(f"'{f.replace(os.sep, '/')}'" for f in clean_files)
+        self.con.execute(f"""
+            CREATE OR REPLACE VIEW clean25 AS
+            SELECT pickup_time, dropoff_time, pickup_loc, dropoff_loc,
+                   trip_distance, fare, total_amount, congestion_surcharge
+            FROM read_parquet([{files_sql}], hive_partitioning=false)
+        """)
+
+    def _load_baseline_2024(self):
+        """Materialize the Q1 2024 baseline once with only the five columns
+        the plots need. Both the border-effect and velocity queries used to
+        re-open and fully decode the same six parquet files; projecting the
+        narrow column set here means each file is read exactly once."""
+        files_2024 = [
+            f"{self.raw_path}/{color}_tripdata_2024-{month:02d}.parquet"
+            for color in ("yellow", "green") for month in (1, 2, 3)
+        ]
+        self.con.execute("""
+            CREATE OR REPLACE TABLE base24 AS
+            SELECT
+                COALESCE(tpep_pickup_datetime, lpep_pickup_datetime) AS pickup_time,
+                COALESCE(tpep_dropoff_datetime, lpep_dropoff_datetime) AS dropoff_time,
+                PULocationID AS pickup_loc,
+                DOLocationID AS dropoff_loc,
+                trip_distance,
+                CASE WHEN filename LIKE '%yellow%' THEN 'yellow' ELSE 'green' END AS taxi_type
+            FROM read_parquet(?, union_by_name=True, filename=True)
+        """, [files_2024])
+
+    def _build_agg_2025(self):
+        """Pre-aggregate the 2025 clean data once at (month, weekday, hour,
+        pickup, dropoff) grain. The three plots used to scan the full clean
+        data three times with different groupings; each is now a small
+        reduction over this cube. Averages are carried as sum + count pairs
+        (FILTERed to each plot's row predicate) so they recombine exactly."""
+        self.con.execute("""
+            CREATE OR REPLACE TABLE agg25 AS
+            SELECT
+                date_trunc('month', pickup_time) AS month_start,
+                isodow(pickup_time) AS day_num,
+                extract(hour from pickup_time) AS hour_num,
+                pickup_loc,
+                dropoff_loc,
+                COUNT(*) AS trips,
+                COUNT(*) FILTER (WHERE trip_distance > 0.5
+                    AND (date_part('epoch', dropoff_time) - date_part('epoch', pickup_time)) > 60) AS speed_trips,
+                SUM(trip_distance / (date_part('epoch', dropoff_time) - date_part('epoch', pickup_time)) * 3600)
+                    FILTER (WHERE trip_distance > 0.5
+                        AND (date_part('epoch', dropoff_time) - date_part('epoch', pickup_time)) > 60) AS sum_speed,
+                COUNT(*) FILTER (WHERE fare > 0) AS fare_trips,
+                SUM(COALESCE(congestion_surcharge, 0)) FILTER (WHERE fare > 0) AS sum_surcharge,
+                -- fare > 0 already implies fare IS NOT NULL, so the old
+                -- COALESCE chain around fare was dead code; the division is
+                -- branchless once the null checks move into the FILTER.
+                COUNT(*) FILTER (WHERE fare > 0 AND total_amount IS NOT NULL) AS tip_trips,
+                SUM((total_amount - fare - COALESCE(congestion_surcharge, 0)) / fare)
+                    FILTER (WHERE fare > 0 AND total_amount IS NOT NULL) AS sum_tip_ratio
+            FROM clean25
+            GROUP BY 1, 2, 3, 4, 5
+        """)
+
+    def _fetch_border_effect(self):
+        # Runs on a worker thread: own cursor, shared database.
+        cur = self.con.cursor()
+        # One hash aggregate over both years instead of two aggregates plus
+        # a join: the sides are unioned with per-year weights (base24 is
+        # row-level, agg25 carries pre-counted trips) and summed in a single
+        # pass. HAVING keeps the old inner-join semantics — a zone must
+        # appear in both years.
+        final_query = """
+            WITH combined AS (
+                SELECT dropoff_loc AS ZoneID, 1::BIGINT AS w24, 0::BIGINT AS w25
+                FROM base24
+                WHERE dropoff_loc IN (SELECT zone_id FROM border_zones)
+                UNION ALL
+                SELECT dropoff_loc, 0, trips
+                FROM agg25
+                WHERE dropoff_loc IN (SELECT zone_id FROM border_zones)
+                AND month_start >= '2025-01-01' AND month_start < '2025-04-01'
+            ),
+            counts AS (
+                SELECT ZoneID, SUM(w24) AS count_2024, SUM(w25) AS count_2025
+                FROM combined
+                GROUP BY 1
+                HAVING SUM(w24) > 0 AND SUM(w25) > 0
+            )
+            SELECT
+                CAST(ZoneID AS VARCHAR) AS ZoneID,
+                ((count_2025 - count_2024) / count_2024::FLOAT) * 100 as pct_change,
+                CASE WHEN ZoneID IN (SELECT zone_id FROM congestion_zones)
+                     THEN 'Inside Zone' ELSE 'Outside Zone' END as location_type
+            FROM counts
+        """
+        # Materialize the ~dozen-row result so the base24 scan runs exactly
+        # once; the CSV for the map and the plot arrays both read the temp
+        # table (cursor-local, so it can't collide with other workers).
+        out_csv = os.path.join(RESULTS_DIR, "border_effect.csv").replace(os.sep, '/')
+        cur.execute(f"CREATE TEMP TABLE border_rows AS {final_query}")
+        cur.execute(f"""
+            COPY (SELECT * FROM border_rows ORDER BY pct_change DESC)
+            TO '{out_csv}' (HEADER, DELIMITER ',')
+        """)
+        arrs = cur.execute(
+            "SELECT * FROM border_rows ORDER BY pct_change DESC"
+        ).fetchnumpy()
+        cur.execute("DROP TABLE border_rows")
+        return arrs
+
+    def plot_border_effect(self, arrs):
+        print("  > Generating 'Border Effect' Data & Image...")
+
+        # Plot Image (border_effect.csv for the map is written by the fetch).
+        # Matplotlib primitives over the raw arrays — seaborn's DataFrame
+        # API added nothing here but a pandas construction per plot.
+        self._fig.clf()
+        self._fig.set_size_inches(12, 6)
+        ax = self._fig.add_subplot(111)
+        palette = {"Inside Zone": "#e74c3c", "Outside Zone": "#3498db"}
+        colors = np.where(arrs['location_type'] == 'Inside Zone',
+                          palette['Inside Zone'], palette['Outside Zone'])
+        ax.bar(arrs['ZoneID'], arrs['pct_change'], color=colors)
+        ax.legend(handles=[Patch(color=c, label=l) for l, c in palette.items()])
+        ax.set_ylabel('pct_change')
+        ax.axhline(0, color='black', linewidth=1)
+        ax.set_title("Border Effect: % Change in Drop-offs (Q1 2024 vs Q1 2025)", fontsize=14)
+        self._fig.savefig(os.path.join(RESULTS_DIR, "viz_border_effect.webp"))
+        print("    - Saved: viz_border_effect.webp + border_effect.csv")
+
+    def _fetch_pivot(self, cur, query):
+        # fetchnumpy hands back plain arrays with no Arrow->pandas hop; the
+        # (day, hour, speed) rows scatter straight into the 7x24 matrix.
+        arrs = cur.execute(query).fetchnumpy()
+        pivot = np.full((7, 24), np.nan)
+        pivot[arrs['day_num'].astype(int) - 1, arrs['hour_num'].astype(int)] = arrs['avg_speed']
+        return pivot
+
+    def _save_heatmap_img(self, pivot, filename, title):
+        self._fig.clf()
+        self._fig.set_size_inches(10, 6)
+        ax = self._fig.add_subplot(111)
+        sns.heatmap(pivot, cmap="magma", annot=False, fmt=".1f", vmin=5, vmax=20,
+                    yticklabels=['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'], ax=ax)
+        ax.set_title(title, fontsize=12)
+        self._fig.savefig(os.path.join(RESULTS_DIR, filename))
+        print(f"    - Saved: {filename}")
+
+    def _fetch_velocity_heatmaps(self):
+        cur = self.con.cursor()
+
+        # 1. BEFORE (2024) — yellow only, as before, via the taxi_type filter.
+        q_24 = """
+            SELECT isodow(pickup_time) as day_num, extract(hour from pickup_time) as hour_num,
+            AVG(trip_distance / (date_part('epoch', dropoff_time) - date_part('epoch', pickup_time)) * 3600) as avg_speed
+            FROM base24
+            WHERE taxi_type = 'yellow'
+            AND pickup_loc IN (SELECT zone_id FROM congestion_zones)
+            AND dropoff_loc IN (SELECT zone_id FROM congestion_zones)
+            AND trip_distance > 0.5
+            AND (date_part('epoch', dropoff_time) - date_part('epoch', pickup_time)) > 60
+            GROUP BY 1, 2
+        """
+        # 2. AFTER (2025) — recombine the cube's sum/count pairs; HAVING
+        # drops cells where no trip passed the speed predicate, exactly as
+        # the row-level WHERE used to.
+        q_25 = """
+            SELECT day_num, hour_num,
+            SUM(sum_speed) / SUM(speed_trips) as avg_speed
+            FROM agg25
+            WHERE pickup_loc IN (SELECT zone_id FROM congestion_zones)
+            AND dropoff_loc IN (SELECT zone_id FROM congestion_zones)
+            AND month_start >= '2025-01-01' AND month_start < '2025-04-01'
+            GROUP BY 1, 2
+            HAVING SUM(speed_trips) > 0
+        """
+        return self._fetch_pivot(cur, q_24), self._fetch_pivot(cur, q_25)
+
+    def plot_velocity_heatmaps(self, pivots):
+        print("  > Generating 'Before vs After' Velocity Heatmaps...")
+        pivot_24, pivot_25 = pivots
+        self._save_heatmap_img(pivot_24, "viz_velocity_2024.webp", "Congestion Velocity: Q1 2024 (Baseline)")
+        self._save_heatmap_img(pivot_25, "viz_velocity_2025.webp", "Congestion Velocity: Q1 2025 (Post-Toll)")
+
+        # Save MAIN heatmap for dashboard default
+        self._save_heatmap_img(pivot_25, "viz_velocity_heatmap.webp", "Congestion Velocity: Q1 2025 (Post-Toll)")
+
+    def _fetch_crowding_out(self):
+        cur = self.con.cursor()
+        query = """
+            SELECT strftime(month_start, '%Y-%m') as month_str,
+            SUM(sum_surcharge) / SUM(fare_trips) as avg_surcharge,
+            SUM(sum_tip_ratio) / SUM(tip_trips) * 100 as avg_tip_pct
+            FROM agg25
+            WHERE month_start >= '2024-01-01' AND month_start < '2026-01-01'
+            GROUP BY 1
+            HAVING SUM(fare_trips) > 0
+            ORDER BY 1
+        """
+        return cur.execute(query).fetchnumpy()
+
+    def plot_crowding_out(self, arrs):
+        print("  > Generating 'Crowding Out' Analysis (FORCE VISIBILITY MODE)...")
+        months = arrs['month_str']
+        surcharges = arrs['avg_surcharge']
+        tip_pcts = arrs['avg_tip_pct']
+
+        # DEBUG PRINT: Verify data exists
+        print("    [DEBUG] Tip Data Preview:")
+        for month, tip in zip(months[:5], tip_pcts[:5]):
+            print(f"      {month}  {tip:.6f}")
+
+        self._fig.clf()
+        self._fig.set_size_inches(12, 6)
+        ax1 = self._fig.add_subplot(111)
+
+        # 1. Plot Blue Bars (Surcharge) - Semi-transparent so they don't hide anything
+        color = 'tab:blue'
+        ax1.set_xlabel('Month')
+        ax1.set_ylabel('Avg Surcharge ($)', color=color, fontweight='bold')
+        ax1.bar(months, surcharges, color=color, alpha=0.4, label='Surcharge')
+        ax1.tick_params(axis='y', labelcolor=color)
+        plt.setp(ax1.xaxis.get_majorticklabels(), rotation=45, ha='right')
+        
+        # 2. Plot Red Line (Tips) - Secondary Axis
+        ax2 = ax1.twinx()
+        color = 'tab:red'
+        ax2.set_ylabel('Avg Tip %', color=color, fontweight='bold')
+        
+        # FORCE SCALE: Ensure the line doesn't disappear if values are small
+        # We set the limit from 0 to 120% of the max value to keep it centered
+        max_tip = tip_pcts.max()
+        if max_tip > 0:
+            ax2.set_ylim(0, max_tip * 1.2)
+
+        # FORCE Z-ORDER: Draw line ON TOP of everything (zorder=10)
+        ax2.plot(months, tip_pcts, color=color, marker='o',
+                 linewidth=4, markersize=8, label='Tip %', zorder=10)
+        ax2.tick_params(axis='y', labelcolor=color)
+        
+        # TRICK: Ensure ax2 background is transparent so ax1 bars show through
+        ax2.patch.set_visible(False)
+        ax1.set_zorder(1)
+        ax2.set_zorder(10)
+        
+        ax1.set_title("Crowding Out Effect: Surcharge vs Tip %", fontsize=14)
+        self._fig.savefig(os.path.join(RESULTS_DIR, "viz_crowding_out.webp"))
+        print("    - Saved: viz_crowding_out.webp")
+
+    def run(self):
+        # The three SQL workloads run concurrently on their own cursors
+        # (DuckDB connections are thread-safe via cursor()); matplotlib is
+        # not, so all rendering stays on the main thread once the frames
+        # are back.
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            border_future = pool.submit(self._fetch_border_effect)
+            velocity_future = pool.submit(self._fetch_velocity_heatmaps)
+            crowding_future = pool.submit(self._fetch_crowding_out)
+            df_border = border_future.result()
+            velocity_pivots = velocity_future.result()
+            df_crowding = crowding_future.result()
+
+        self.plot_border_effect(df_border)
+        self.plot_velocity_heatmaps(velocity_pivots)
+        self.plot_crowding_out(df_crowding)
+
+if __name__ == "__main__":
+    audit = VisualAudit()
     audit.run()
\ No newline at end of file